@@ -1,20 +1,62 @@
-import os
 import logging
-import json
+import time
 import asyncio
-from datetime import datetime, timezone, timedelta
+from collections import OrderedDict
+from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
+    AIORateLimiter,
     Application,
     CommandHandler,
     MessageHandler,
     CallbackQueryHandler,
     ConversationHandler,
     ContextTypes,
+    TypeHandler,
     filters,
 )
 from telegram.constants import ParseMode
-from telegram.error import Forbidden, BadRequest
+from telegram.request import HTTPXRequest
+from telegram.error import Forbidden, BadRequest, TelegramError
+
+try:
+    import uvloop
+except ImportError:  # Not available on Windows; fall back to the default asyncio loop
+    uvloop = None
+
+from config import (
+    BOT_TOKEN,
+    CHANNEL_ID,
+    ADMIN_CHAT_ID,
+    ADMIN_IDS,
+    WEBHOOK_HOST,
+    PORT,
+    CONVERSATION_TIMEOUT,
+    CONFIRM_MARKUP,
+    CONFIRM_PATTERN,
+    DELETE_PATTERN,
+    MALAYSIA_TZ,
+    TIMESTAMP_FORMAT,
+    ADMIN_TEMPLATE,
+    MARKDOWN_V2_ESCAPE,
+    BROADCAST_CONCURRENCY,
+    CONNECTION_POOL_SIZE,
+    MEMBER_STATUSES,
+    MEMBER_CACHE_TTL,
+    MEMBER_CACHE_SIZE,
+    LEGACY_USERS_DB,
+    USERS_FLUSH_INTERVAL,
+)
+from persistence import (
+    open_database,
+    close_database,
+    import_legacy_users,
+    load_known_users,
+    remember_user,
+    flush_users,
+    count_users,
+    iter_user_ids,
+)
 
 # --- Configuration: Setting up logging ---
 logging.basicConfig(
@@ -25,55 +67,53 @@ logger = logging.getLogger(__name__)
 # --- State definitions for conversations ---
 SUBMITTING, AWAITING_CONFIRMATION, BROADCASTING = range(3)
 
-# --- Files for persistence ---
-USERS_DB = "users.json"
-
-# --- Helper functions for data persistence ---
-def load_json_data(filepath: str) -> dict:
-    if not os.path.exists(filepath):
-        return {}
-    try:
-        with open(filepath, "r") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        logger.error(f"Could not read or parse {filepath}", exc_info=True)
-        return {}
-
-def save_json_data(filepath: str, data: dict):
-    try:
-        with open(filepath, "w") as f:
-            json.dump(data, f, indent=4)
-    except IOError:
-        logger.error(f"Could not write to {filepath}", exc_info=True)
+# --- Channel membership cache ---
+MEMBER_CACHE: OrderedDict = OrderedDict()  # user_id -> time membership was last confirmed
+
+# --- Helper functions for channel membership ---
+async def is_channel_member(bot, user_id: int) -> bool:
+    """Checks channel membership, reusing a recent positive answer instead of asking Telegram again."""
+    now = time.monotonic()
+    checked_at = MEMBER_CACHE.get(user_id)
+    if checked_at is not None and now - checked_at < MEMBER_CACHE_TTL:
+        MEMBER_CACHE.move_to_end(user_id)
+        return True
+
+    member = await bot.get_chat_member(chat_id=CHANNEL_ID, user_id=user_id)
+    if member.status not in MEMBER_STATUSES:
+        # Not cached: a user told to join should pass as soon as they /start again
+        MEMBER_CACHE.pop(user_id, None)
+        return False
+    MEMBER_CACHE[user_id] = now
+    MEMBER_CACHE.move_to_end(user_id)
+    if len(MEMBER_CACHE) > MEMBER_CACHE_SIZE:
+        MEMBER_CACHE.popitem(last=False)
+    return True
 
 # --- User-facing conversation handlers ---
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Starts the bot, saves user ID, and checks for channel membership."""
     user = update.effective_user
     user_id = user.id
-    CHANNEL_ID = os.getenv("TELEGRAM_CHANNEL_ID")
     
     # Save user ID for broadcasting
-    users = load_json_data(USERS_DB)
-    if str(user_id) not in users:
-        users[str(user_id)] = {"username": user.username, "first_name": user.first_name}
-        save_json_data(USERS_DB, users)
-        logger.info(f"New user saved: {user_id}")
+    remember_user(user)
 
     await update.message.reply_text("Welcome! Let me check if you're a member of our channel first...")
 
     try:
-        member = await context.bot.get_chat_member(chat_id=CHANNEL_ID, user_id=user_id)
-        if member.status not in ["member", "administrator", "creator"]:
-            raise Exception("User is not a member.")
-        
-        logger.info(f"User {user_id} is a member.")
-        await update.message.reply_text(
-            "Great, you're a member! Please send me the message you want to post.\n\nTo cancel at any time, type /cancel."
-        )
-        return SUBMITTING
-        
-    except Exception:
+        is_member = await is_channel_member(context.bot, user_id)
+    except (BadRequest, Forbidden):
+        # Telegram rejects the lookup for users it can't find in the channel
+        is_member = False
+    except TelegramError as e:
+        # Anything else (timeouts, RetryAfter flood limits, server errors) says nothing about
+        # membership, so don't send a member away
+        logger.warning(f"Could not check channel membership for user {user_id}: {e}")
+        await update.message.reply_text("Telegram is busy, please try /start again shortly.")
+        return ConversationHandler.END
+
+    if not is_member:
         logger.info(f"User {user_id} is not a member of {CHANNEL_ID}.")
         channel_link = f"https://t.me/{CHANNEL_ID.lstrip('@')}"
         await update.message.reply_text(
@@ -81,29 +121,28 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         )
         return ConversationHandler.END
 
+    logger.info(f"User {user_id} is a member.")
+    await update.message.reply_text(
+        "Great, you're a member! Please send me the message you want to post.\n\nTo cancel at any time, type /cancel."
+    )
+    return SUBMITTING
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Receives user message and asks for confirmation before posting."""
     message_text = update.message.text
     context.user_data["message_to_send"] = message_text
 
-    keyboard = [
-        [
-            InlineKeyboardButton("✅ Yes, post it", callback_data="confirm_post_yes"),
-            InlineKeyboardButton("❌ No, cancel", callback_data="confirm_post_no"),
-        ]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
     await update.message.reply_text(
         f"Your message:\n---\n{message_text}\n---\n\nAre you sure you want to post this anonymously?",
-        reply_markup=reply_markup,
+        reply_markup=CONFIRM_MARKUP,
     )
     return AWAITING_CONFIRMATION
 
 async def handle_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handles user confirmation to post or cancel the message."""
     query = update.callback_query
-    await query.answer()
+    # Acknowledge the click without waiting for it; the real work proceeds in parallel
+    context.application.create_task(query.answer(), update=update)
 
     if query.data == "confirm_post_yes":
         message_text = context.user_data.get("message_to_send")
@@ -112,8 +151,6 @@ async def handle_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE
             return ConversationHandler.END
 
         user = query.from_user
-        CHANNEL_ID = os.getenv("TELEGRAM_CHANNEL_ID")
-        ADMIN_CHAT_ID = os.getenv("TELEGRAM_ADMIN_CHAT_ID")
 
         try:
             # Post the message to the public channel
@@ -129,11 +166,8 @@ async def handle_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE
             # Prepare user info and timestamp for admin
             user_info = f"ID: `{user.id}`"
             if user.username:
-                user_info += f", Username: @{user.username}"
-            
-            # Timezone for Malaysia (GMT+8)
-            malaysia_tz = timezone(timedelta(hours=8))
-            timestamp = datetime.now(malaysia_tz).strftime("%d %b %Y, %I:%M %p")
+                user_info += f", Username: @{user.username.translate(MARKDOWN_V2_ESCAPE)}"
+            timestamp = datetime.now(MALAYSIA_TZ).strftime(TIMESTAMP_FORMAT)
 
             # Send a notification to the admin with a delete button
             keyboard = [
@@ -145,14 +179,13 @@ async def handle_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE
 
             await context.bot.send_message(
                 chat_id=ADMIN_CHAT_ID,
-                text=(
-                    f"*New Post*\n\n"
-                    f"👤 *User:* {user_info}\n"
-                    f"⏰ *Time:* {timestamp} (GMT+8)\n\n"
-                    f"*Message Content:*\n---\n{message_text}\n---"
+                text=ADMIN_TEMPLATE.format(
+                    user=user_info,
+                    timestamp=timestamp,
+                    message=message_text.translate(MARKDOWN_V2_ESCAPE),
                 ),
                 reply_markup=reply_markup,
-                parse_mode=ParseMode.MARKDOWN,
+                parse_mode=ParseMode.MARKDOWN_V2,
             )
         except Exception as e:
             logger.error(f"Failed to post message for user {user.id}: {e}", exc_info=True)
@@ -169,17 +202,21 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await update.message.reply_text("Operation cancelled.")
     return ConversationHandler.END
 
+async def conversation_timeout(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Forgets the draft of a conversation the user abandoned."""
+    context.user_data.clear()
+
 
 # --- Admin-facing handlers ---
 async def handle_admin_action(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handles 'Delete' from the admin chat."""
     query = update.callback_query
-    await query.answer()
+    # Acknowledge the click without waiting for it; the real work proceeds in parallel
+    context.application.create_task(query.answer(), update=update)
 
     action, message_id = query.data.split(":", 1)
     
     if action == "delete":
-        CHANNEL_ID = os.getenv("TELEGRAM_CHANNEL_ID")
         try:
             await context.bot.delete_message(chat_id=CHANNEL_ID, message_id=int(message_id))
             await query.edit_message_text(text="🗑️ Message has been deleted from the channel.", reply_markup=None)
@@ -195,9 +232,7 @@ async def handle_admin_action(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 async def broadcast_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Starts the broadcast conversation. Admin only."""
-    ADMIN_CHAT_ID = os.getenv("TELEGRAM_ADMIN_CHAT_ID")
-    # A simple check to see if the user is the admin. For multi-admin setups, a list would be better.
-    if str(update.effective_user.id) not in ADMIN_CHAT_ID:
+    if update.effective_user.id not in ADMIN_IDS:
         await update.message.reply_text("This command is for admins only.")
         return ConversationHandler.END
 
@@ -207,60 +242,128 @@ async def broadcast_start(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 async def broadcast_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Sends the broadcast message to all users."""
     broadcast_text = update.message.text
-    users = load_json_data(USERS_DB)
-    
-    await update.message.reply_text(f"Starting broadcast to {len(users)} users. This may take a while...")
-    
-    success_count = 0
-    fail_count = 0
-    for user_id in users:
-        try:
-            await context.bot.send_message(chat_id=user_id, text=broadcast_text)
-            success_count += 1
-            await asyncio.sleep(0.1) # Avoid hitting rate limits
-        except Forbidden:
-            logger.warning(f"User {user_id} has blocked the bot. Skipping.")
-            fail_count += 1
-        except Exception as e:
-            logger.error(f"Failed to send broadcast to {user_id}: {e}")
-            fail_count += 1
-            
+    # No users are written while a broadcast's recipient stream is open, so every stream
+    # sees exactly the users it counted; the periodic flush waits until broadcasts finish
+    if not context.bot_data.get("broadcasts_running"):
+        flush_users()  # Include users who joined since the last flush
+    context.bot_data["broadcasts_running"] = context.bot_data.get("broadcasts_running", 0) + 1
+    try:
+        user_count = count_users()
+
+        await update.message.reply_text(f"Starting broadcast to {user_count} users. This may take a while...")
+
+        recipients = iter_user_ids()
+        success_count = 0
+        fail_count = 0
+
+        async def sender():
+            nonlocal success_count, fail_count
+            for user_id in recipients:
+                try:
+                    await context.bot.send_message(chat_id=user_id, text=broadcast_text)
+                    success_count += 1
+                except Forbidden:
+                    logger.warning(f"User {user_id} has blocked the bot. Skipping.")
+                    fail_count += 1
+                except Exception as e:
+                    logger.error(f"Failed to send broadcast to {user_id}: {e}")
+                    fail_count += 1
+
+        # A fixed pool of senders shares the recipient stream; the rate limiter on the
+        # application keeps the sends within Telegram's limits
+        await asyncio.gather(*(sender() for _ in range(BROADCAST_CONCURRENCY)))
+    finally:
+        context.bot_data["broadcasts_running"] -= 1
+
     await update.message.reply_text(
         f"Broadcast complete.\n\nSuccessfully sent: {success_count}\nFailed or blocked: {fail_count}"
     )
     return ConversationHandler.END
 
+# --- Application lifecycle hooks ---
+async def flush_users_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Periodic job that writes newly seen users to the database."""
+    if context.bot_data.get("broadcasts_running"):
+        return
+    flush_users()
+
+async def post_init(application: Application) -> None:
+    """Loads the known user IDs and schedules the periodic flush of new users."""
+    load_known_users()
+    application.job_queue.run_repeating(flush_users_job, interval=USERS_FLUSH_INTERVAL)
+
+async def post_shutdown(application: Application) -> None:
+    """Saves users still waiting for a flush and closes the database."""
+    flush_users()
+    close_database()
+
 # --- Main Bot Setup ---
 def main() -> None:
     """Run the bot."""
-    env_vars = ["TELEGRAM_BOT_TOKEN", "TELEGRAM_CHANNEL_ID", "TELEGRAM_ADMIN_CHAT_ID"]
-    if not all(os.getenv(var) for var in env_vars):
+    if not all((BOT_TOKEN, CHANNEL_ID, ADMIN_CHAT_ID)):
+        env_vars = ["TELEGRAM_BOT_TOKEN", "TELEGRAM_CHANNEL_ID", "TELEGRAM_ADMIN_CHAT_ID"]
         logger.fatal(f"FATAL: One or more environment variables are not set. Required: {', '.join(env_vars)}")
         return
+    if ADMIN_IDS is None:
+        logger.fatal("FATAL: TELEGRAM_ADMIN_IDS must be a comma-separated list of numeric user IDs.")
+        return
 
-    application = Application.builder().token(os.getenv("TELEGRAM_BOT_TOKEN")).build()
+    open_database()
+    import_legacy_users(LEGACY_USERS_DB)
+
+    if uvloop:
+        # Installed as the current loop before the application is built; run_polling and
+        # run_webhook pick it up through asyncio.get_event_loop()
+        asyncio.set_event_loop(uvloop.new_event_loop())
+
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        # One long-lived pool big enough for concurrent broadcast sends; polling gets its own
+        .request(HTTPXRequest(connection_pool_size=CONNECTION_POOL_SIZE, pool_timeout=30))
+        .get_updates_request(HTTPXRequest(connection_pool_size=4))
+        .rate_limiter(AIORateLimiter())
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     submission_conv = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
         states={
             SUBMITTING: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message)],
-            AWAITING_CONFIRMATION: [CallbackQueryHandler(handle_confirmation, pattern="^confirm_post_.*")],
+            AWAITING_CONFIRMATION: [CallbackQueryHandler(handle_confirmation, pattern=CONFIRM_PATTERN)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conversation_timeout)],
         },
         fallbacks=[CommandHandler("cancel", cancel)],
+        conversation_timeout=CONVERSATION_TIMEOUT,
     )
     
     broadcast_conv = ConversationHandler(
         entry_points=[CommandHandler("broadcast", broadcast_start)],
-        states={BROADCASTING: [MessageHandler(filters.TEXT & ~filters.COMMAND, broadcast_message)]},
+        states={
+            BROADCASTING: [MessageHandler(filters.TEXT & ~filters.COMMAND, broadcast_message)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conversation_timeout)],
+        },
         fallbacks=[CommandHandler("cancel", cancel)],
+        conversation_timeout=CONVERSATION_TIMEOUT,
     )
 
     application.add_handler(submission_conv)
     application.add_handler(broadcast_conv)
-    application.add_handler(CallbackQueryHandler(handle_admin_action, pattern="^delete:.*"))
+    application.add_handler(CallbackQueryHandler(handle_admin_action, pattern=DELETE_PATTERN))
 
     logger.info("Bot is starting...")
-    application.run_polling()
+    if WEBHOOK_HOST:
+        # Telegram pushes updates to us; run_webhook registers the webhook on startup
+        application.run_webhook(
+            listen="0.0.0.0",
+            port=PORT,
+            url_path=BOT_TOKEN,
+            webhook_url=f"https://{WEBHOOK_HOST}/{BOT_TOKEN}",
+        )
+    else:
+        application.run_polling()
 
 if __name__ == "__main__":
     main()
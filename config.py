@@ -0,0 +1,71 @@
+import os
+import re
+from datetime import timezone, timedelta
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+# --- Configuration: Environment, read once at startup ---
+BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+CHANNEL_ID = os.getenv("TELEGRAM_CHANNEL_ID")
+ADMIN_CHAT_ID = os.getenv("TELEGRAM_ADMIN_CHAT_ID")
+
+def parse_id_list(value: str):
+    """Parses a comma-separated list of numeric IDs. Returns None if any entry isn't numeric."""
+    try:
+        return frozenset(int(i) for i in value.split(",") if i.strip())
+    except ValueError:
+        return None
+
+# Users allowed to broadcast, as a comma-separated TELEGRAM_ADMIN_IDS list (None if malformed).
+# When unset, a numeric admin chat ID (the admin's private chat) is the only admin.
+ADMIN_IDS_ENV = os.getenv("TELEGRAM_ADMIN_IDS")
+if ADMIN_IDS_ENV is not None:
+    ADMIN_IDS = parse_id_list(ADMIN_IDS_ENV)
+elif ADMIN_CHAT_ID and ADMIN_CHAT_ID.lstrip("-").isdigit():
+    ADMIN_IDS = frozenset({int(ADMIN_CHAT_ID)})
+else:
+    ADMIN_IDS = frozenset()
+# Public HTTPS host for webhook mode; when unset the bot falls back to long polling
+WEBHOOK_HOST = os.getenv("TELEGRAM_WEBHOOK_HOST")
+PORT = int(os.getenv("PORT", "8443"))
+
+# --- Idle conversations are dropped after this long ---
+CONVERSATION_TIMEOUT = timedelta(minutes=10)
+
+# --- Keyboards and callback patterns, built once ---
+CONFIRM_MARKUP = InlineKeyboardMarkup(
+    [
+        [
+            InlineKeyboardButton("✅ Yes, post it", callback_data="confirm_post_yes"),
+            InlineKeyboardButton("❌ No, cancel", callback_data="confirm_post_no"),
+        ]
+    ]
+)
+CONFIRM_PATTERN = re.compile(r"^confirm_post_")
+DELETE_PATTERN = re.compile(r"^delete:")
+
+# --- Admin notification ---
+MALAYSIA_TZ = timezone(timedelta(hours=8))  # Timezone for Malaysia (GMT+8)
+TIMESTAMP_FORMAT = "%d %b %Y, %I:%M %p"
+# Sent as MarkdownV2, so literal special characters in the template are escaped
+ADMIN_TEMPLATE = (
+    "*New Post*\n\n"
+    "👤 *User:* {user}\n"
+    "⏰ *Time:* {timestamp} \\(GMT\\+8\\)\n\n"
+    "*Message Content:*\n\\-\\-\\-\n{message}\n\\-\\-\\-"
+)
+# Escapes user-supplied text for MarkdownV2 in a single str.translate pass
+MARKDOWN_V2_ESCAPE = str.maketrans({c: "\\" + c for c in "\\_*[]()~`>#+-=|{}.!"})
+
+# --- Broadcast settings ---
+BROADCAST_CONCURRENCY = 25  # Messages in flight at once during a broadcast
+CONNECTION_POOL_SIZE = 64  # HTTP connections for bot API calls; must exceed BROADCAST_CONCURRENCY
+
+# --- Channel membership cache ---
+MEMBER_STATUSES = frozenset({"member", "administrator", "creator"})
+MEMBER_CACHE_TTL = 300  # Seconds a membership check is trusted
+MEMBER_CACHE_SIZE = 10000  # Most users remembered at once; the oldest are evicted first
+
+# --- Files for persistence ---
+DB_PATH = "bot.db"
+LEGACY_USERS_DB = "users.json"  # Imported into the database on first start
+USERS_FLUSH_INTERVAL = 30  # Seconds between writes of newly seen users
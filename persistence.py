@@ -0,0 +1,98 @@
+import os
+import json
+import logging
+import sqlite3
+
+from config import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+# --- Shared database connection, opened once by open_database() ---
+db: sqlite3.Connection = None
+# IDs of every saved or queued user, loaded once at startup so /start never queries the database
+KNOWN_USERS: set = set()
+# New users waiting for the next flush, so handlers never touch the disk
+UNSAVED_USERS: list = []
+
+# --- Helper functions for data persistence ---
+def load_json_data(filepath: str) -> dict:
+    if not os.path.exists(filepath):
+        return {}
+    try:
+        with open(filepath, "r") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError):
+        logger.error(f"Could not read or parse {filepath}", exc_info=True)
+        return {}
+
+def open_database(filepath: str = DB_PATH):
+    """Opens the bot database in WAL mode and creates the tables if needed."""
+    global db
+    db = sqlite3.connect(filepath, isolation_level=None, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS users ("
+        "user_id INTEGER PRIMARY KEY, username TEXT, first_name TEXT)"
+    )
+
+def close_database():
+    db.close()
+
+def import_legacy_users(filepath: str):
+    """Copies users from the old JSON store into an empty users table."""
+    if db.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+        return
+    users = load_json_data(filepath)
+    if not users:
+        return
+    db.execute("BEGIN")
+    db.executemany(
+        "INSERT OR IGNORE INTO users VALUES (?, ?, ?)",
+        [(int(user_id), u.get("username"), u.get("first_name")) for user_id, u in users.items()],
+    )
+    db.execute("COMMIT")
+    logger.info(f"Imported {len(users)} users from {filepath}")
+
+def load_known_users():
+    KNOWN_USERS.update(iter_user_ids())
+
+def remember_user(user):
+    """Queues a user for the next flush unless they are already known."""
+    if user.id not in KNOWN_USERS:
+        KNOWN_USERS.add(user.id)
+        UNSAVED_USERS.append((user.id, user.username, user.first_name))
+
+def save_users(rows: list) -> bool:
+    """Inserts a batch of (user_id, username, first_name) rows in one transaction. Returns True on success."""
+    try:
+        db.execute("BEGIN")
+        before = db.total_changes
+        db.executemany("INSERT OR IGNORE INTO users VALUES (?, ?, ?)", rows)
+        db.execute("COMMIT")
+    except sqlite3.Error:
+        logger.error(f"Could not save {len(rows)} users to {DB_PATH}", exc_info=True)
+        if db.in_transaction:
+            db.execute("ROLLBACK")
+        return False
+    new_users = db.total_changes - before
+    if new_users:
+        logger.info(f"New users saved: {new_users}")
+    return True
+
+def flush_users():
+    """Writes all users queued since the last flush in a single batch."""
+    if not UNSAVED_USERS:
+        return
+    rows = UNSAVED_USERS[:]
+    UNSAVED_USERS.clear()
+    if not save_users(rows):
+        # Keep the rows for the next flush; their IDs stay in KNOWN_USERS so they aren't queued twice
+        UNSAVED_USERS[:0] = rows
+
+def count_users() -> int:
+    return db.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+def iter_user_ids():
+    """Streams user IDs from the database rather than loading them into memory up front."""
+    return (user_id for (user_id,) in db.execute("SELECT user_id FROM users"))